@@ -1,4 +1,12 @@
 from .engine import DAGEngine, DAGNode
 from .observers import Observer, PrintObserver
+from .recorder import EventRecorder, EventReader
 
-__all__ = ["DAGEngine", "DAGNode", "Observer", "PrintObserver"]
+__all__ = [
+    "DAGEngine",
+    "DAGNode",
+    "Observer",
+    "PrintObserver",
+    "EventRecorder",
+    "EventReader",
+]
@@ -1,3 +1,5 @@
+import time
+
 from enum import Enum
 from abc import ABC, abstractmethod
 from typing import Callable, List
@@ -16,6 +18,7 @@ class EventLevel(Enum):
 class Event(ABC):
     def __init__(self):
         self.level = EventLevel.INFO
+        self.timestamp = time.time()
 
     @abstractmethod
     def to_dict():
@@ -77,24 +80,29 @@ class WorkflowStatusChangeEvent(ChangeEvent):
 
 class ErrorEvent(Event):
     def __init__(self):
+        super().__init__()
         self.level = EventLevel.ERROR
 
 
 class NodeErrorEvent(ErrorEvent):
-    def __init__(self, location: str, message: str):
+    def __init__(
+        self, location: str, message: str, context: SingleRunContext = None
+    ):
         super().__init__()
         self.level = EventLevel.ERROR
         self.location = location
         self.message = message
+        self.context = context
 
     def to_dict(
         self,
     ):
-        return {
-            "level": self.level.name,
-            "location": self.location,
-            "message": self.message,
-        }
+        event_dict = {"level": self.level.name}
+        if self.context is not None:
+            event_dict["run_id"] = str(self.context.run_id)
+        event_dict["location"] = self.location
+        event_dict["message"] = self.message
+        return event_dict
 
 
 class WorkflowErrorEvent(ErrorEvent):
@@ -117,17 +125,21 @@ class WorkflowErrorEvent(ErrorEvent):
 
 
 class UnexpectedErrorEvent(ErrorEvent):
-    def __init__(self, location: str, fail_message: str):
+    def __init__(
+        self, location: str, fail_message: str, context: SingleRunContext = None
+    ):
         super().__init__()
         self.level = EventLevel.CRITICAL
         self.location = location
         self.fail_message = fail_message
+        self.context = context
 
     def to_dict(
         self,
     ):
-        return {
-            "level": self.level.name,
-            "location": self.location,
-            "message": self.fail_message,
-        }
+        event_dict = {"level": self.level.name}
+        if self.context is not None:
+            event_dict["run_id"] = str(self.context.run_id)
+        event_dict["location"] = self.location
+        event_dict["message"] = self.fail_message
+        return event_dict
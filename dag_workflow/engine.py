@@ -87,6 +87,7 @@ class DAGEngine:
                     unexpected_error_event = UnexpectedErrorEvent(
                         location=str(self.running_workflow[done_future].run_id),
                         fail_message=done_future.exception(),
+                        context=failed_context,
                     )
                     self._notify_observers(unexpected_error_event)
                     self._change_workflow_status(failed_context, WorkflowStatus.FAILED)
@@ -287,7 +288,9 @@ class DAGEngine:
         failed_node_id = futures[failed_future].node_id
         logger.debug(f"node {failed_node_id} failed with message {fail_message}")
 
-        node_error_event = NodeErrorEvent(location=failed_node_id, message=fail_message)
+        node_error_event = NodeErrorEvent(
+            location=failed_node_id, message=fail_message, context=context
+        )
         self._notify_observers(event=node_error_event)
 
         self._cancel_pending_tasks(context=context, futures=futures)
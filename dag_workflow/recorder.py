@@ -0,0 +1,376 @@
+"""
+段文件格式(小端):
+
+    文件头: SEGMENT_MAGIC
+    记录:   [length:u32][kind:u8][body...]
+
+length为整条记录(含length本身)的字节数,length为0表示段内数据结束.
+段文件创建时预分配好大小,之后不再改变,未写入的部分全是0,天然就是结束标记.
+写入时先写body再写length,所以并发读取正在写的段时不会读到半条记录.
+
+kind == KIND_INTERN:  [ref:u32][utf8字符串]  声明一个驻留字符串,只在本段内有效
+其余kind:             [level:u8][timestamp:f64][run_id:16s][node_ref:u32]
+                      [formal_status:u8][after_status:u8][payload]
+错误事件的payload:    [location_len:u16][location][zlib压缩的message]
+"""
+
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import uuid
+import zlib
+
+from typing import Dict, Iterator, List, Optional, Union
+
+from .datamodel import (
+    Event,
+    NodeStatus,
+    WorkflowStatus,
+    SingleRunContext,
+    NodeStatusChangeEvent,
+    WorkflowStatusChangeEvent,
+    NodeErrorEvent,
+    WorkflowErrorEvent,
+    UnexpectedErrorEvent,
+)
+from .datamodel.events import EventLevel
+from .observers import Observer
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_MAGIC = b"DAGEVT01"
+SEGMENT_PATTERN = re.compile(r"^events-(\d{8})\.seg$")
+
+KIND_INTERN = 0
+KIND_NODE_STATUS = 1
+KIND_WORKFLOW_STATUS = 2
+KIND_NODE_ERROR = 3
+KIND_WORKFLOW_ERROR = 4
+KIND_UNEXPECTED_ERROR = 5
+
+NO_REF = 0xFFFFFFFF
+NO_STATUS = 0xFF
+NO_RUN_ID = bytes(16)
+
+_PREFIX = struct.Struct("<IB")
+_INTERN = struct.Struct("<IBI")
+_RECORD = struct.Struct("<IBBd16sIBB")
+_LOCATION = struct.Struct("<H")
+
+
+def _segment_name(index: int) -> str:
+    return f"events-{index:08d}.seg"
+
+
+def _list_segments(directory: str) -> List[str]:
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(
+        name for name in os.listdir(directory) if SEGMENT_PATTERN.match(name)
+    )
+    return [os.path.join(directory, name) for name in names]
+
+
+def _run_id_bytes(run_id) -> bytes:
+    if run_id is None:
+        return NO_RUN_ID
+    if isinstance(run_id, uuid.UUID):
+        return run_id.bytes
+    return uuid.UUID(str(run_id)).bytes
+
+
+class EventRecorder(Observer):
+    """把事件以紧凑的二进制记录写入内存映射的段文件,段写满后轮转到新文件
+
+    node_id在段内驻留为u32编号,状态和level存为枚举值,错误信息用zlib压缩.
+    段文件预先分配segment_size字节,close时也不截断,因为读者可能还映射着这个段;
+    即使没有close,已写入的记录也可以被EventReader读出.
+    """
+
+    def __init__(self, directory: str, segment_size: int = 4 * 1024 * 1024):
+        if segment_size <= len(SEGMENT_MAGIC) + _RECORD.size:
+            raise ValueError(f"segment_size {segment_size} is too small")
+        self.directory = directory
+        self.segment_size = segment_size
+        self.lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        existing = _list_segments(directory)
+        self.segment_index = (
+            int(SEGMENT_PATTERN.match(os.path.basename(existing[-1])).group(1)) + 1
+            if existing
+            else 0
+        )
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._position = 0
+        self._interned: Dict[str, int] = {}
+
+    def on_status_change(self, event: Event):
+        # 记录失败不能影响workflow,异常只记日志
+        with self.lock:
+            try:
+                self._write_event(event)
+            except Exception:
+                logger.exception(f"failed to record event {type(event).__name__}")
+
+    def flush(self):
+        with self.lock:
+            if self._mmap is not None:
+                self._mmap.flush()
+
+    def close(self):
+        with self.lock:
+            self._close_segment()
+
+    def _open_segment(self, size: int):
+        # 其他recorder(其他引擎或进程)可能在用同一个目录,只能独占创建新段,
+        # 编号被占用就往后顺延,绝不覆盖别人的段
+        while True:
+            path = os.path.join(self.directory, _segment_name(self.segment_index))
+            self.segment_index += 1
+            try:
+                self._file = open(path, "x+b")
+                break
+            except FileExistsError:
+                continue
+        try:
+            self._file.truncate(size)
+            self._mmap = mmap.mmap(self._file.fileno(), size)
+        except Exception:
+            self._file.close()
+            self._file = None
+            raise
+        self._mmap[: len(SEGMENT_MAGIC)] = SEGMENT_MAGIC
+        self._position = len(SEGMENT_MAGIC)
+        self._interned = {}
+
+    def _close_segment(self):
+        if self._mmap is None:
+            return
+        self._mmap.flush()
+        self._mmap.close()
+        self._file.close()
+        self._mmap = None
+        self._file = None
+
+    def _append(self, record: bytes):
+        """写入一条完整记录,length字段最后写"""
+        end = self._position + len(record)
+        self._mmap[self._position + 4 : end] = record[4:]
+        self._mmap[self._position : self._position + 4] = record[:4]
+        self._position = end
+
+    def _intern(self, value: str) -> int:
+        ref = self._interned.get(value)
+        if ref is None:
+            ref = len(self._interned)
+            self._interned[value] = ref
+            data = value.encode("utf-8")
+            header = _INTERN.pack(_INTERN.size + len(data), KIND_INTERN, ref)
+            self._append(header + data)
+        return ref
+
+    def _write_event(self, event: Event):
+        encoded = self._encode(event)
+        if encoded is None:
+            return
+        kind, node_id, formal_status, after_status, payload = encoded
+        context = getattr(event, "context", None)
+        run_id = _run_id_bytes(context.run_id) if context is not None else NO_RUN_ID
+
+        # 记录和它可能需要的驻留声明必须落在同一个段里,另外留出4字节给段尾的0长度标记
+        needed = _RECORD.size + len(payload) + 4
+        intern_size = 0
+        if node_id is not None:
+            intern_size = _INTERN.size + len(node_id.encode("utf-8"))
+
+        if self._mmap is not None:
+            pending = intern_size if node_id not in self._interned else 0
+            if self._position + needed + pending > len(self._mmap):
+                self._close_segment()
+        if self._mmap is None:
+            # 新段的驻留表是空的,大小一次算好再创建,避免留下只有文件头的空段
+            self._open_segment(
+                max(self.segment_size, len(SEGMENT_MAGIC) + needed + intern_size)
+            )
+
+        node_ref = self._intern(node_id) if node_id is not None else NO_REF
+        header = _RECORD.pack(
+            _RECORD.size + len(payload),
+            kind,
+            event.level.value,
+            event.timestamp,
+            run_id,
+            node_ref,
+            formal_status,
+            after_status,
+        )
+        self._append(header + payload)
+
+    def _encode(self, event: Event):
+        """返回(kind, node_id, formal_status, after_status, payload),不认识的事件返回None"""
+        if isinstance(event, NodeStatusChangeEvent):
+            return (
+                KIND_NODE_STATUS,
+                event.node_id,
+                event.formal_status.value,
+                event.after_status.value,
+                b"",
+            )
+        if isinstance(event, WorkflowStatusChangeEvent):
+            return (
+                KIND_WORKFLOW_STATUS,
+                None,
+                event.formal_status.value,
+                event.after_status.value,
+                b"",
+            )
+        if isinstance(event, NodeErrorEvent):
+            kind, message = KIND_NODE_ERROR, event.message
+        elif isinstance(event, WorkflowErrorEvent):
+            kind, message = KIND_WORKFLOW_ERROR, event.message
+        elif isinstance(event, UnexpectedErrorEvent):
+            kind, message = KIND_UNEXPECTED_ERROR, event.fail_message
+        else:
+            return None
+
+        location = str(event.location).encode("utf-8")[:0xFFFF]
+        payload = (
+            _LOCATION.pack(len(location))
+            + location
+            + zlib.compress(str(message).encode("utf-8"))
+        )
+        return kind, None, NO_STATUS, NO_STATUS, payload
+
+
+class EventReader:
+    """读取EventRecorder写出的段文件,按run_id或时间范围流式还原事件"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def segments(self) -> List[str]:
+        return _list_segments(self.directory)
+
+    def read(
+        self,
+        run_id: Union[str, uuid.UUID, None] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> Iterator[Event]:
+        """按记录顺序产出事件,start/end为time.time()时间戳,闭区间"""
+        wanted = _run_id_bytes(run_id) if run_id is not None else None
+        contexts: Dict[bytes, SingleRunContext] = {}
+        for path in self.segments():
+            yield from self._read_segment(path, wanted, start, end, contexts)
+
+    def replay(
+        self,
+        observers: Union[Observer, List[Observer]],
+        run_id: Union[str, uuid.UUID, None] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> int:
+        """把记录的事件重新推给观察者,返回回放的事件数"""
+        if isinstance(observers, Observer):
+            observers = [observers]
+        count = 0
+        for event in self.read(run_id=run_id, start=start, end=end):
+            for observer in observers:
+                observer.on_status_change(event)
+            count += 1
+        return count
+
+    def _read_segment(self, path, wanted, start, end, contexts):
+        with open(path, "rb") as f:
+            # 只映射打开时看到的大小,越界读会直接SIGBUS
+            size = os.fstat(f.fileno()).st_size
+            if size <= len(SEGMENT_MAGIC):
+                return
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                magic = mm[: len(SEGMENT_MAGIC)]
+                if magic == bytes(len(SEGMENT_MAGIC)):
+                    # recorder刚创建,还没写入文件头
+                    return
+                if magic != SEGMENT_MAGIC:
+                    raise ValueError(f"{path} is not an event segment")
+                strings: Dict[int, str] = {}
+                position = len(SEGMENT_MAGIC)
+                while position + _PREFIX.size <= size:
+                    length, kind = _PREFIX.unpack_from(mm, position)
+                    if length < _PREFIX.size or position + length > size:
+                        break
+                    record = mm[position : position + length]
+                    position += length
+
+                    if kind == KIND_INTERN:
+                        _, _, ref = _INTERN.unpack_from(record)
+                        strings[ref] = record[_INTERN.size :].decode("utf-8")
+                        continue
+
+                    (
+                        _,
+                        _,
+                        level,
+                        timestamp,
+                        run_id,
+                        node_ref,
+                        formal_status,
+                        after_status,
+                    ) = _RECORD.unpack_from(record)
+                    if wanted is not None and run_id != wanted:
+                        continue
+                    if start is not None and timestamp < start:
+                        continue
+                    if end is not None and timestamp > end:
+                        continue
+
+                    event = self._decode(
+                        kind,
+                        self._context(run_id, contexts),
+                        strings.get(node_ref),
+                        formal_status,
+                        after_status,
+                        record[_RECORD.size :],
+                    )
+                    event.level = EventLevel(level)
+                    event.timestamp = timestamp
+                    yield event
+
+    def _context(self, run_id: bytes, contexts: Dict[bytes, SingleRunContext]):
+        if run_id == NO_RUN_ID:
+            return None
+        context = contexts.get(run_id)
+        if context is None:
+            context = SingleRunContext(input_data=None)
+            context.run_id = uuid.UUID(bytes=run_id)
+            contexts[run_id] = context
+        return context
+
+    def _decode(self, kind, context, node_id, formal_status, after_status, payload):
+        if kind == KIND_NODE_STATUS:
+            return NodeStatusChangeEvent(
+                context, node_id, NodeStatus(formal_status), NodeStatus(after_status)
+            )
+        if kind == KIND_WORKFLOW_STATUS:
+            return WorkflowStatusChangeEvent(
+                context, WorkflowStatus(formal_status), WorkflowStatus(after_status)
+            )
+
+        (location_len,) = _LOCATION.unpack_from(payload)
+        location_end = _LOCATION.size + location_len
+        location = payload[_LOCATION.size : location_end].decode("utf-8", "replace")
+        message = zlib.decompress(payload[location_end:]).decode("utf-8")
+        if kind == KIND_NODE_ERROR:
+            return NodeErrorEvent(location=location, message=message, context=context)
+        if kind == KIND_WORKFLOW_ERROR:
+            return WorkflowErrorEvent(context, location=location, message=message)
+        if kind == KIND_UNEXPECTED_ERROR:
+            return UnexpectedErrorEvent(
+                location=location, fail_message=message, context=context
+            )
+        raise ValueError(f"unknown record kind {kind}")
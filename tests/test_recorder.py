@@ -0,0 +1,209 @@
+import os
+import struct
+import time
+
+import pytest
+
+from dag_workflow import EventRecorder, EventReader, Observer
+from dag_workflow.datamodel import (
+    NodeStatus,
+    WorkflowStatus,
+    SingleRunContext,
+    NodeStatusChangeEvent,
+    WorkflowStatusChangeEvent,
+    NodeErrorEvent,
+    WorkflowErrorEvent,
+    UnexpectedErrorEvent,
+)
+from dag_workflow.recorder import KIND_INTERN, SEGMENT_MAGIC
+
+
+class ListObserver(Observer):
+    def __init__(self):
+        self.events = []
+
+    def on_status_change(self, event):
+        self.events.append(event)
+
+
+def interned_strings(path):
+    """按顺序返回段内的驻留声明"""
+    with open(path, "rb") as f:
+        data = f.read()
+    strings = []
+    position = len(SEGMENT_MAGIC)
+    while position + 5 <= len(data):
+        length, kind = struct.unpack_from("<IB", data, position)
+        if length == 0:
+            break
+        if kind == KIND_INTERN:
+            strings.append(data[position + 9 : position + length].decode("utf-8"))
+        position += length
+    return strings
+
+
+def node_event(context, node_id, after=NodeStatus.RUNNING):
+    return NodeStatusChangeEvent(context, node_id, NodeStatus.PENDING, after)
+
+
+@pytest.fixture
+def context():
+    return SingleRunContext(input_data=None)
+
+
+def test_round_trip_all_event_kinds(tmp_path, context):
+    recorder = EventRecorder(str(tmp_path))
+    events = [
+        WorkflowStatusChangeEvent(
+            context, WorkflowStatus.PENDING, WorkflowStatus.RUNNING
+        ),
+        node_event(context, "节点1", NodeStatus.FAILED),
+        NodeErrorEvent(
+            location="节点1", message="Traceback: 除零错误 ÷ 0", context=context
+        ),
+        WorkflowErrorEvent(context, location=str(context.run_id), message="boom"),
+        UnexpectedErrorEvent(
+            location=str(context.run_id),
+            fail_message="unexpected",
+            context=context,
+        ),
+    ]
+    for event in events:
+        recorder.on_status_change(event)
+    recorder.close()
+
+    replayed = list(EventReader(str(tmp_path)).read())
+    assert [type(e) for e in replayed] == [type(e) for e in events]
+    for original, restored in zip(events, replayed):
+        assert restored.timestamp == original.timestamp
+        assert restored.level == original.level
+        assert restored.context.run_id == context.run_id
+        assert restored.to_dict() == original.to_dict()
+    assert replayed[2].message == "Traceback: 除零错误 ÷ 0"
+    assert replayed[4].fail_message == "unexpected"
+
+
+def test_rotation_restarts_interning(tmp_path, context):
+    recorder = EventRecorder(str(tmp_path), segment_size=256)
+    for i in range(20):
+        recorder.on_status_change(node_event(context, f"node{i % 2}"))
+    recorder.close()
+
+    reader = EventReader(str(tmp_path))
+    segments = reader.segments()
+    assert len(segments) > 1
+    for path in segments:
+        assert os.path.getsize(path) == 256
+        strings = interned_strings(path)
+        assert len(strings) == len(set(strings))
+        assert strings[0] == "node0"
+    assert [e.node_id for e in reader.read()] == [f"node{i % 2}" for i in range(20)]
+
+
+def test_oversized_record_gets_larger_segment(tmp_path, context):
+    recorder = EventRecorder(str(tmp_path), segment_size=256)
+    message = os.urandom(4096).hex()
+    recorder.on_status_change(node_event(context, "small"))
+    recorder.on_status_change(
+        WorkflowErrorEvent(context, location="big", message=message)
+    )
+    recorder.close()
+
+    reader = EventReader(str(tmp_path))
+    sizes = [os.path.getsize(path) for path in reader.segments()]
+    assert sizes[0] == 256
+    assert sizes[1] > 256
+    assert [e.message for e in reader.read() if hasattr(e, "message")] == [message]
+
+
+def test_oversized_first_record_leaves_no_empty_segment(tmp_path, context):
+    recorder = EventRecorder(str(tmp_path), segment_size=256)
+    recorder.on_status_change(
+        WorkflowErrorEvent(context, location="big", message=os.urandom(4096).hex())
+    )
+    recorder.close()
+
+    assert len(EventReader(str(tmp_path)).segments()) == 1
+
+
+def test_filter_by_run_id_and_time(tmp_path):
+    first = SingleRunContext(input_data=None)
+    second = SingleRunContext(input_data=None)
+    recorder = EventRecorder(str(tmp_path))
+    for index, ctx in enumerate([first, second, first]):
+        event = node_event(ctx, f"node{index}")
+        event.timestamp = 100.0 + index
+        recorder.on_status_change(event)
+    recorder.close()
+
+    reader = EventReader(str(tmp_path))
+    by_str = [e.node_id for e in reader.read(run_id=str(first.run_id))]
+    by_uuid = [e.node_id for e in reader.read(run_id=first.run_id)]
+    assert by_str == by_uuid == ["node0", "node2"]
+    assert [e.node_id for e in reader.read(start=101.0)] == ["node1", "node2"]
+    assert [e.node_id for e in reader.read(end=101.0)] == ["node0", "node1"]
+    assert [
+        e.node_id for e in reader.read(run_id=first.run_id, start=100.5, end=102.0)
+    ] == ["node2"]
+
+
+def test_read_segment_never_closed(tmp_path, context):
+    recorder = EventRecorder(str(tmp_path), segment_size=4096)
+    for i in range(3):
+        recorder.on_status_change(node_event(context, f"node{i}"))
+
+    reader = EventReader(str(tmp_path))
+    assert [e.node_id for e in reader.read()] == ["node0", "node1", "node2"]
+    recorder.on_status_change(node_event(context, "node3"))
+    assert len(list(reader.read())) == 4
+
+
+def test_close_while_reading(tmp_path, context):
+    recorder = EventRecorder(str(tmp_path), segment_size=4096)
+    for _ in range(113):
+        recorder.on_status_change(
+            WorkflowStatusChangeEvent(
+                context, WorkflowStatus.PENDING, WorkflowStatus.RUNNING
+            )
+        )
+    events = EventReader(str(tmp_path)).read()
+    next(events)
+    recorder.close()
+    assert 1 + sum(1 for _ in events) == 113
+
+
+def test_recorders_sharing_directory(tmp_path, context):
+    first = EventRecorder(str(tmp_path))
+    second = EventRecorder(str(tmp_path))
+    first.on_status_change(node_event(context, "first"))
+    second.on_status_change(node_event(context, "second"))
+    first.close()
+    second.close()
+
+    reader = EventReader(str(tmp_path))
+    assert len(reader.segments()) == 2
+    assert sorted(e.node_id for e in reader.read()) == ["first", "second"]
+
+
+def test_recording_failure_does_not_raise(tmp_path, context):
+    recorder = EventRecorder(str(tmp_path))
+    recorder.on_status_change(node_event(context, 123))
+    recorder.on_status_change(node_event(context, "ok"))
+    recorder.close()
+
+    assert [e.node_id for e in EventReader(str(tmp_path)).read()] == ["ok"]
+
+
+def test_replay_returns_count(tmp_path, context):
+    recorder = EventRecorder(str(tmp_path))
+    start = time.time()
+    for i in range(5):
+        recorder.on_status_change(node_event(context, f"node{i}"))
+    recorder.close()
+
+    first, second = ListObserver(), ListObserver()
+    reader = EventReader(str(tmp_path))
+    assert reader.replay([first, second], run_id=context.run_id, start=start) == 5
+    assert reader.replay(first, run_id=SingleRunContext(None).run_id) == 0
+    assert [e.node_id for e in second.events] == [f"node{i}" for i in range(5)]
+    assert len(first.events) == 5